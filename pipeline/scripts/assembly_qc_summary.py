@@ -9,19 +9,34 @@ named lists in `snakemake.input`:
 - gff_files: A list of paths to GFF files for annotation summary.
 """
 
-import pandas as pd
+import os
 import re
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
+# Read size for the GFF scan, and a pattern matching a non-comment GFF line whose
+# third column ('type') is exactly 'CDS'.
+GFF_CHUNK_SIZE = 4 << 20
+CDS_LINE_RE = re.compile(rb'^(?!#)[^\t\n]*\t[^\t\n]*\tCDS\t', re.MULTILINE)
+# The same match as an ERE for grep, with literal tabs since POSIX grep has no '\t' escape
+CDS_LINE_ERE = '^([^#\t][^\t]*)?\t[^\t]*\tCDS\t'
+GREP = shutil.which('grep')
+MEAN_DEPTH_RE = re.compile(r'Mean depth:\s*([\d\.]+)')
+
 def parse_quast_report(path: Path) -> dict:
     """Parses a QUAST report.tsv file for key metrics."""
     if not path.exists():
         return {}
     
-    # Read the two-column TSV into a dictionary
-    report_df = pd.read_csv(path, sep='\t', header=None, index_col=0, names=['Metric', 'Value'])
-    metrics = report_df.to_dict()['Value']
+    # Read the two-column TSV into a dictionary; the file is tiny, so plain string splitting is enough
+    metrics = {}
+    with path.open('r') as f:
+        for line in f:
+            metric, _, value = line.rstrip('\r\n').partition('\t')
+            metrics[metric.strip()] = value.split('\t', 1)[0].strip()
     
     return {
         'Contigs': metrics.get('# contigs', 'N/A'),
@@ -37,63 +52,97 @@ def parse_depth_file(path: Path) -> str:
         return "N/A"
     
     content = path.read_text()
-    match = re.search(r'Mean depth:\s*([\d\.]+)', content)
+    match = MEAN_DEPTH_RE.search(content)
     return f"{float(match.group(1)):.1f}x" if match else "N/A"
 
 def count_cds_in_gff(path: Path) -> int:
     """Counts the number of CDS features in a GFF file."""
     if not path.exists():
         return 0
-    
+
+    # grep's line matcher is considerably faster than anything we can do in Python
+    # on large annotations; fall back to the Python scan if grep is unavailable
+    if GREP:
+        result = subprocess.run([GREP, '-c', '-E', CDS_LINE_ERE, str(path)],
+                                capture_output=True, text=True, env={**os.environ, 'LC_ALL': 'C'})
+        # Exit status 1 only means no lines matched; 2 is a real error
+        if result.returncode in (0, 1):
+            return int(result.stdout.strip() or 0)
+    return _scan_cds_in_gff(path)
+
+def _scan_cds_in_gff(path: Path) -> int:
+    """Counts CDS features by scanning the GFF in Python."""
+    # Scan the raw bytes in large chunks so the per-line work happens inside the
+    # regex engine rather than in Python. Only complete lines are scanned; the
+    # trailing partial line is carried over into the next chunk.
     count = 0
-    with path.open('r') as f:
-        for line in f:
-            if line.startswith('#'):
-                continue
-            fields = line.split('\t')
-            if len(fields) > 2 and fields[2] == 'CDS':
-                count += 1
+    carry = b''
+    with path.open('rb') as f:
+        while True:
+            chunk = f.read(GFF_CHUNK_SIZE)
+            if not chunk:
+                break
+            buf = carry + chunk
+            end = buf.rfind(b'\n') + 1
+            count += len(CDS_LINE_RE.findall(buf, 0, end))
+            carry = buf[end:]
+    if carry:
+        count += len(CDS_LINE_RE.findall(carry))
     return count
 
 def get_sample_id_from_path(path: Path) -> str:
     """Extracts the sample ID from a file path like 'results/.../{sample}/...'."""
-    # This regex looks for the pattern /<directory>/<sample_id>/
-    match = re.search(r"results/[^/]+/([^/]+)/", str(path))
-    if match:
-        return match.group(1)
+    # The sample ID is the second path component below 'results/'
+    parts = path.parts
+    try:
+        i = parts.index('results')
+    except ValueError:
+        i = len(parts)
+    # The sample directory must itself have something beneath it
+    if i + 3 < len(parts):
+        return parts[i + 2]
     raise ValueError(f"Could not extract sample ID from path: {path}")
 
+def to_markdown_table(rows: list) -> str:
+    """Renders a list of same-keyed dictionaries as a GitHub-flavoured Markdown table."""
+    if not rows:
+        return ''
+    headers = list(rows[0].keys())
+    lines = ['| ' + ' | '.join(headers) + ' |', '|' + '|'.join(['---'] * len(headers)) + '|']
+    # Missing values render as empty cells, as tabulate did for None
+    lines += ['| ' + ' | '.join('' if row.get(h) is None else str(row[h]) for h in headers) + ' |' for row in rows]
+    return '\n'.join(lines)
+
+def summarize_sample(quast_path_str: str) -> dict:
+    """Collects the QUAST, depth and annotation metrics for one sample."""
+    quast_path = Path(quast_path_str)
+    sample_id = get_sample_id_from_path(quast_path)
+    
+    # Find corresponding files for the same sample_id
+    depth_path = Path(f"results/evaluation/{sample_id}/depth.txt")
+    gff_path = Path(f"results/annotation/{sample_id}/prokka/{sample_id}.gff") # Assumes Prokka
+    
+    # Parse all data for the sample
+    quast_metrics = parse_quast_report(quast_path)
+    mean_depth = parse_depth_file(depth_path)
+    cds_count = count_cds_in_gff(gff_path)
+    
+    return {
+        'Sample ID': sample_id,
+        'Contigs': quast_metrics.get('Contigs'),
+        'Total Length': quast_metrics.get('Total Length'),
+        'N50': quast_metrics.get('N50'),
+        'GC (%)': quast_metrics.get('GC (%)'),
+        'Mean Depth': mean_depth,
+        'CDS Count': cds_count,
+    }
+
 def main():
     """Main script execution."""
-    summary_data = []
-
-    # Use the list of QUAST reports as the primary loop iterator
-    for quast_path_str in snakemake.input.quast_reports:
-        quast_path = Path(quast_path_str)
-        sample_id = get_sample_id_from_path(quast_path)
-        
-        # Find corresponding files for the same sample_id
-        depth_path = Path(f"results/evaluation/{sample_id}/depth.txt")
-        gff_path = Path(f"results/annotation/{sample_id}/prokka/{sample_id}.gff") # Assumes Prokka
-        
-        # Parse all data for the sample
-        quast_metrics = parse_quast_report(quast_path)
-        mean_depth = parse_depth_file(depth_path)
-        cds_count = count_cds_in_gff(gff_path)
-        
-        sample_summary = {
-            'Sample ID': sample_id,
-            'Contigs': quast_metrics.get('Contigs'),
-            'Total Length': quast_metrics.get('Total Length'),
-            'N50': quast_metrics.get('N50'),
-            'GC (%)': quast_metrics.get('GC (%)'),
-            'Mean Depth': mean_depth,
-            'CDS Count': cds_count,
-        }
-        summary_data.append(sample_summary)
-
-    # Create a DataFrame for easy formatting
-    summary_df = pd.DataFrame(summary_data)
+    # Samples are independent and parsing them is mostly file I/O, so threads are enough
+    # to overlap it; map() keeps the rows in the order of the QUAST reports
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as ex:
+        summary_data = list(ex.map(summarize_sample, snakemake.input.quast_reports))
 
     # Generate the Markdown output
     report_content = f"""
@@ -103,7 +152,7 @@ def main():
 
 This report summarizes the final assembly quality metrics for all processed samples.
 
-{summary_df.to_markdown(index=False)}
+{to_markdown_table(summary_data)}
 
 ---
 **Total samples processed**: {len(summary_data)}
@@ -8,7 +8,8 @@ Writes a final samples.resolved.tsv with all local paths populated and the
 This script is the final preparation step before running the Snakemake workflow.
 """
 from __future__ import annotations
-import argparse, csv, os, re, shutil, subprocess, sys, tempfile
+import argparse, csv, functools, gzip, os, re, shutil, subprocess, sys, tempfile, threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field, fields
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
@@ -16,31 +17,83 @@ from typing import Dict, List, Optional, Tuple
 # --- DEPENDENCY CHECK ---
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
 except ImportError:
     sys.exit("ERROR: The 'requests' library is required. Please install it: pip install requests")
 
 # --- HELPER FUNCTIONS ---
-def eprint(*args, **kwargs): print(*args, file=sys.stderr, **kwargs)
+_PRINT_LOCK = threading.Lock() # Samples are fetched concurrently; keep their log lines from interleaving
+def eprint(*args, **kwargs):
+    with _PRINT_LOCK: print(*args, file=sys.stderr, **kwargs)
 def run(cmd: List[str], check: bool = True, env: Optional[Dict[str, str]] = None): eprint("[cmd]", " ".join(cmd)); return subprocess.run(cmd, check=check, env=env)
 def ensure_parent(path: Path): path.parent.mkdir(parents=True, exist_ok=True)
+@functools.lru_cache(maxsize=None) # PATH does not change during a run; the tool checks are hit per sample and per SRR
 def which(prog: str) -> Optional[str]: return shutil.which(prog)
+def _size_or_zero(p: str | Path) -> int:
+    # One stat instead of exists() + stat(); missing, unreadable and empty ("") paths all count as 0
+    try: return os.stat(p).st_size
+    except OSError: return 0
 
 # --- ENA/SRA QUERY LOGIC ---
-ENA_READ_RUN_FIELDS = ["run_accession", "instrument_platform", "library_layout"]
+ENA_READ_RUN_FIELDS = ["run_accession", "sample_accession", "instrument_platform", "library_layout"]
 ENA_BASE = "https://www.ebi.ac.uk/ena/portal/api/filereport"
+ENA_SEARCH = "https://www.ebi.ac.uk/ena/portal/api/search"
+ENA_BATCH_SIZE = 100
+# (connect, read) seconds: an unreachable host fails fast and is retried, a slow report still gets time
+ENA_TIMEOUT = (5, 30)
+# One pooled session for all ENA queries, so concurrent samples reuse connections instead of
+# paying a TCP+TLS handshake each; transient throttling/gateway errors are retried with backoff.
+# POST is retried too: the batched search is a read-only query. requests already asks for
+# gzip-compressed responses by default.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16,
+                                       max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504],
+                                                         allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"})))
+# Runs per biosample, filled up front by ena_query_runs_bulk()
+_ENA_CACHE: Dict[str, List[Dict[str, str]]] = {}
+
+def parse_ena_tsv(text: str) -> List[Dict[str, str]]:
+    lines = [l for l in text.splitlines() if l.strip()]
+    if not lines or len(lines) < 2: return []
+    header = lines[0].split("\t")
+    return [dict(zip(header, l.split("\t"))) for l in lines[1:]]
+
+# Hybrid samples and shared biosamples would otherwise repeat the query per platform. lru_cache does not
+# store raised exceptions, so only successful responses are cached and a failed lookup is retried next time.
+@functools.lru_cache(maxsize=1024)
+def _ena_filereport(biosample: str) -> List[Dict[str, str]]:
+    params = {"accession": biosample, "result": "read_run", "fields": ",".join(ENA_READ_RUN_FIELDS), "download": "true"}
+    r = _SESSION.get(ENA_BASE, params=params, timeout=ENA_TIMEOUT)
+    r.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
+    return parse_ena_tsv(r.text)
+
 def ena_query_runs_by_biosample(biosample: str) -> List[Dict[str, str]]:
     if not biosample: return []
-    params = {"accession": biosample, "result": "read_run", "fields": ",".join(ENA_READ_RUN_FIELDS), "download": "true"}
     try:
-        r = requests.get(ENA_BASE, params=params, timeout=30)
-        r.raise_for_status() # Raise an exception for bad status codes (4xx or 5xx)
+        return _ena_filereport(biosample)
     except requests.RequestException as e:
         eprint(f"Warning: ENA query failed for {biosample}: {e}")
         return []
-    lines = [l for l in r.text.splitlines() if l.strip()]
-    if not lines or len(lines) < 2: return []
-    header = lines[0].split("\t")
-    return [dict(zip(header, l.split("\t"))) for l in lines[1:]]
+
+def ena_query_runs_bulk(biosamples: List[str]) -> Dict[str, List[Dict[str, str]]]:
+    # filereport takes a single accession, so batches go through the search endpoint with an OR query
+    by_biosample: Dict[str, List[Dict[str, str]]] = {}
+    unique = list(dict.fromkeys(b for b in biosamples if b))
+    for i in range(0, len(unique), ENA_BATCH_SIZE):
+        chunk = unique[i:i + ENA_BATCH_SIZE]
+        data = {"result": "read_run", "fields": ",".join(ENA_READ_RUN_FIELDS), "format": "tsv",
+                "query": " OR ".join(f'sample_accession="{b}"' for b in chunk)}
+        try:
+            r = _SESSION.post(ENA_SEARCH, data=data, timeout=(ENA_TIMEOUT[0], 2 * ENA_TIMEOUT[1]))
+            r.raise_for_status()
+        except requests.RequestException as e:
+            eprint(f"Warning: batched ENA query failed for {len(chunk)} biosamples: {e}")
+            continue # Those biosamples fall back to one query each
+        # Accessions the search did not match (e.g. secondary SRS/ERS IDs) are left out and fall back too
+        for row in parse_ena_tsv(r.text):
+            by_biosample.setdefault(row.get("sample_accession", ""), []).append(row)
+    return by_biosample
 
 def platform_matches(row: Dict[str, str], want: str) -> bool:
     inst = (row.get("instrument_platform") or "").strip().upper()
@@ -49,57 +102,129 @@ def platform_matches(row: Dict[str, str], want: str) -> bool:
     return False
 
 def resolve_srrs(biosample: str, platform: str) -> List[str]:
-    rows = ena_query_runs_by_biosample(biosample)
+    rows = _ENA_CACHE.get(biosample)
+    if rows is None: rows = ena_query_runs_by_biosample(biosample)
     return [r["run_accession"] for r in rows if platform_matches(r, platform) and r.get("run_accession")]
 
 # --- DATA DOWNLOAD LOGIC ---
 def fasterq_dump_available() -> bool: return which("fasterq-dump") is not None
 def pigz_available() -> bool: return which("pigz") is not None
+def prefetch_available() -> bool: return which("prefetch") is not None
+
+COPY_BUFSIZE = 1 << 20
+
+def compressor_cmd(threads: int) -> List[str]:
+    # Pin pigz to the threads it is given (the sample's share left over after fasterq-dump, which runs
+    # alongside it) so concurrent samples don't oversubscribe the CPUs;
+    # 1 MiB blocks (-b is in KiB) cut per-block sync overhead on multi-GB FASTQ
+    if pigz_available(): return ["pigz", "-c", "-p", str(max(1, threads)), "-b", "1024"]
+    return ["gzip", "-c"]
 
-def gzip_cat_concat(src_files: List[Path], dest_gz: Path) -> bool:
-    ensure_parent(dest_gz)
-    if dest_gz.exists(): dest_gz.unlink()
-    compressor = "pigz" if pigz_available() else "gzip"
-    # Use a temporary file for the concatenated output before compressing
-    with tempfile.NamedTemporaryFile(mode='wb', delete=False) as tmp_cat:
-        for src in src_files:
+def gzip_cat_concat(src_files: List[Path], dest_gz: Path, threads: int) -> bool:
+    # Stream the inputs straight into the compressor's stdin; no uncompressed copy is written to disk
+    with open(dest_gz, 'wb') as f_out:
+        proc = subprocess.Popen(compressor_cmd(threads), stdin=subprocess.PIPE, stdout=f_out)
+        try:
+            for src in src_files:
+                with open(src, 'rb') as f_in:
+                    shutil.copyfileobj(f_in, proc.stdin, COPY_BUFSIZE)
+        except BrokenPipeError:
+            pass # The compressor exited early; its return code reports the failure
+        finally:
+            try: proc.stdin.close()
+            except BrokenPipeError: pass
+            returncode = proc.wait()
+    return returncode == 0
+
+def gz_member_concat(src_gz: List[Path], dest_gz: Path) -> bool:
+    # Concatenated gzip members are themselves a valid gzip stream (RFC 1952), so no recompression is needed
+    if len(src_gz) == 1:
+        shutil.move(str(src_gz[0]), str(dest_gz))
+        return True
+    with open(dest_gz, 'wb') as f_out:
+        for src in src_gz:
             with open(src, 'rb') as f_in:
-                shutil.copyfileobj(f_in, tmp_cat)
-    # Now compress the concatenated file
-    with open(tmp_cat.name, 'rb') as f_in, open(dest_gz, 'wb') as f_out:
-        proc = subprocess.run([compressor], stdin=f_in, stdout=f_out)
-    os.unlink(tmp_cat.name)
-    return proc.returncode == 0
-
-def download_srr(srr: str, workdir: Path, threads: int, illumina_split: bool) -> List[Path]:
-    args = ["fasterq-dump", srr, "-O", str(workdir), "--threads", str(threads), "--temp", str(workdir)]
-    if illumina_split: args.append("--split-files")
-    run(args)
-    # Return paths that were actually created
-    if illumina_split:
-        return [p for p in [workdir / f"{srr}_1.fastq", workdir / f"{srr}_2.fastq"] if p.exists()]
-    else:
-        return [p for p in [workdir / f"{srr}.fastq"] if p.exists()]
+                shutil.copyfileobj(f_in, f_out, COPY_BUFSIZE)
+    return True
+
+def run_to_gz(cmd: List[str], dest_gz: Path, threads: int):
+    # Equivalent of `cmd | pigz -c > dest_gz`, without going through a shell
+    compressor = compressor_cmd(threads)
+    eprint("[cmd]", " ".join(cmd), "|", " ".join(compressor), ">", str(dest_gz))
+    with open(dest_gz, 'wb') as f_out:
+        producer = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+        consumer = subprocess.Popen(compressor, stdin=producer.stdout, stdout=f_out)
+        producer.stdout.close() # Only the compressor holds the read end, so the producer sees SIGPIPE if it dies
+        consumer.wait()
+        producer.wait()
+    for proc in (producer, consumer):
+        if proc.returncode != 0: raise subprocess.CalledProcessError(proc.returncode, proc.args)
+
+def prefetch_srr(srr: str, workdir: Path) -> Optional[Path]:
+    # fasterq-dump on a bare accession streams records from NCBI on demand, which is very slow;
+    # prefetch downloads the whole (resumable) archive first so the dump is purely local
+    if not prefetch_available(): return None
+    if run(["prefetch", srr, "-O", str(workdir), "--max-size", "200g"], check=False).returncode != 0:
+        eprint(f"Warning: prefetch failed for {srr}; fasterq-dump will fetch it remotely")
+        return None
+    # Newer SRA-Tools may deliver the lite (.sralite) form instead of .sra
+    return next((p for p in [workdir / srr / f"{srr}.sra", workdir / srr / f"{srr}.sralite"] if _size_or_zero(p) > 0), None)
 
-def merge_runs_ont(sample_id: str, srrs: List[str], tmpdir: Path, outdir: Path, threads: int) -> Optional[Path]:
+def download_srr(srr: str, workdir: Path, pigz_threads: int, fqd_threads: int, illumina_split: bool) -> List[Path]:
+    local = prefetch_srr(srr, workdir)
+    source = str(local) if local else srr
+    try:
+        if illumina_split:
+            # Mates cannot be kept apart on stdout, so paired runs are still dumped to plain per-mate files
+            run(["fasterq-dump", source, "-O", str(workdir), "--threads", str(fqd_threads), "--temp", str(workdir), "--split-files"])
+            return [p for p in [workdir / f"{srr}_1.fastq", workdir / f"{srr}_2.fastq"] if _size_or_zero(p) > 0]
+        # Single-end (ONT) runs are compressed as they are dumped; no uncompressed FASTQ touches the disk
+        out_gz = workdir / f"{srr}.fastq.gz"
+        run_to_gz(["fasterq-dump", source, "--stdout", "--split-spot", "--threads", str(fqd_threads), "--temp", str(workdir)], out_gz, pigz_threads)
+        # A dump that produced no reads still leaves a valid, non-empty gzip; treat it like a missing file
+        with gzip.open(out_gz, 'rb') as fh:
+            if not fh.read(1):
+                out_gz.unlink()
+                return []
+        return [out_gz]
+    finally:
+        # The archive is no longer needed once dumped; free the space before the next run is fetched.
+        # Cleared unconditionally: a failed prefetch can leave a partial download, and an archive under
+        # an unexpected name would otherwise sit there while fasterq-dump fetches the run remotely.
+        shutil.rmtree(workdir / srr, ignore_errors=True)
+
+def merge_runs_ont(sample_id: str, srrs: List[str], tmpdir: Path, outdir: Path, pigz_threads: int, fqd_threads: int) -> Optional[Path]:
     target = outdir / f"{sample_id}.ont.fastq.gz"
-    produced = [f for srr in srrs for f in download_srr(srr, tmpdir, threads, False)]
+    produced = [f for srr in srrs for f in download_srr(srr, tmpdir, pigz_threads, fqd_threads, False)]
     if not produced: return None
-    if gzip_cat_concat(produced, target): return target
+    if gz_member_concat(produced, target): return target
     return None
 
-def merge_runs_illumina(sample_id: str, srrs: List[str], tmpdir: Path, outdir: Path, threads: int) -> Tuple[Optional[Path], Optional[Path]]:
+def merge_runs_illumina(sample_id: str, srrs: List[str], tmpdir: Path, outdir: Path, pigz_threads: int, fqd_threads: int) -> Tuple[Optional[Path], Optional[Path]]:
     out_r1 = outdir / f"{sample_id}.illumina.R1.fastq.gz"
     out_r2 = outdir / f"{sample_id}.illumina.R2.fastq.gz"
     r1_list, r2_list = [], []
-    for srr in srrs:
-        downloaded = download_srr(srr, tmpdir, threads, True)
+    def compress_run(downloaded: List[Path]):
         for f in downloaded:
-            if f.name.endswith("_1.fastq"): r1_list.append(f)
-            elif f.name.endswith("_2.fastq"): r2_list.append(f)
-    if r1_list: gzip_cat_concat(r1_list, out_r1)
-    if r2_list: gzip_cat_concat(r2_list, out_r2)
-    return (out_r1 if out_r1.exists() else None, out_r2 if out_r2.exists() else None)
+            gz = f.with_suffix(".fastq.gz")
+            if not gzip_cat_concat([f], gz, pigz_threads): raise RuntimeError(f"Compression failed for {f}")
+            f.unlink()
+            if f.name.endswith("_1.fastq"): r1_list.append(gz)
+            elif f.name.endswith("_2.fastq"): r2_list.append(gz)
+    # Compress each run's mates while the next run is being dumped; a single worker keeps the per-run
+    # gzip members in SRR order, and they are joined without recompression at the end. The compressor
+    # only gets pigz_threads, the share main() leaves over after fasterq-dump's fqd_threads, so the
+    # overlap stays within the sample's budget.
+    with ThreadPoolExecutor(max_workers=1) as ex:
+        pending = []
+        for srr in srrs:
+            pending.append(ex.submit(compress_run, download_srr(srr, tmpdir, pigz_threads, fqd_threads, True)))
+            # Wait for the previous run before dumping another, so uncompressed FASTQ doesn't pile up on disk
+            if len(pending) > 1: pending[-2].result()
+        for fut in pending: fut.result()
+    if r1_list: gz_member_concat(r1_list, out_r1)
+    if r2_list: gz_member_concat(r2_list, out_r2)
+    return (out_r1 if _size_or_zero(out_r1) > 0 else None, out_r2 if _size_or_zero(out_r2) > 0 else None)
 
 # --- DATA CONTRACT I/O (ROBUST VERSION) ---
 @dataclass
@@ -114,65 +239,75 @@ class SampleRow:
     barcode: str = ""
     note: str = ""
 
-    @classmethod
-    def from_dict(cls, d: Dict[str, str]) -> "SampleRow":
-        # Only use keys that are actual fields in this dataclass
-        field_names = {f.name for f in fields(cls)}
-        filtered_dict = {k: (v or "").strip() for k, v in d.items() if k in field_names}
-        return cls(**filtered_dict)
-
     def to_dict(self) -> Dict[str, str]:
-        return {f.name: getattr(self, f.name) for f in fields(self)}
+        return {k: getattr(self, k) for k in _FIELDS}
+
+# Field names resolved once, rather than re-introspecting the dataclass for every row
+_FIELDS = tuple(f.name for f in fields(SampleRow))
 
 def read_tsv(p: Path) -> List[SampleRow]:
     with p.open("r", newline="", encoding="utf-8") as fh:
-        # DictReader correctly handles out-of-order columns
-        reader = csv.DictReader(fh, delimiter="\t")
-        return [SampleRow.from_dict(row) for row in reader]
+        # Map the SampleRow columns to their positions once, so columns may come in any order
+        # and no dict is built per row; unknown columns are ignored
+        reader = csv.reader(fh, delimiter="\t")
+        cols = {h: i for i, h in enumerate(next(reader, [])) if h in _FIELDS}
+        return [SampleRow(**{k: row[i].strip() if i < len(row) else "" for k, i in cols.items()})
+                for row in reader if row]
 
 def write_tsv(p: Path, rows: List[SampleRow]):
     ensure_parent(p)
     # The header is defined *only* by the SampleRow dataclass fields. This is the key fix.
-    header = [f.name for f in fields(SampleRow)]
+    header = list(_FIELDS)
     with p.open("w", newline="", encoding="utf-8") as fh:
         writer = csv.DictWriter(fh, fieldnames=header, delimiter="\t")
         writer.writeheader()
-        writer.writerows([r.to_dict() for r in rows])
+        writer.writerows(r.to_dict() for r in rows)
 
 # --- MAIN WORKFLOW ---
-def process_sample(s: SampleRow, outdir: Path, threads: int) -> SampleRow:
+def needs_fetch(s: SampleRow) -> bool:
+    # Mirrors process_sample: a platform's reads are fetched only when its local path is missing
+    if s.platform in ['ont', 'hybrid'] and _size_or_zero(s.ont_reads) == 0: return True
+    if s.platform in ['illumina', 'hybrid'] and _size_or_zero(s.illumina_r1) == 0: return True
+    return False
+
+def process_sample(s: SampleRow, outdir: Path, pigz_threads: int, fqd_threads: int) -> SampleRow:
+    # Stat each given path once; after a fetch the merge helpers report what they produced.
+    has_ont = _size_or_zero(s.ont_reads) > 0
+    has_illumina = _size_or_zero(s.illumina_r1) > 0
+    # The srrs column is a plain comma-separated list; split it once for both platforms
+    explicit_srrs = [x for x in map(str.strip, s.srrs.split(',')) if x]
+
     # If a path is already given, we trust it and do nothing.
-    if s.ont_reads and Path(s.ont_reads).exists():
+    if has_ont:
         s.note = "Kept existing ONT path."
     elif s.platform in ['ont', 'hybrid']:
-        srrs_to_fetch = [x.strip() for x in s.srrs.split(',') if x.strip()] or resolve_srrs(s.biosample, 'ont')
+        srrs_to_fetch = explicit_srrs or resolve_srrs(s.biosample, 'ont')
         if srrs_to_fetch:
             eprint(f"[{s.sample_id}] Fetching ONT reads for SRRs: {srrs_to_fetch}")
             with tempfile.TemporaryDirectory(prefix=f"{s.sample_id}_ont_") as tmp:
-                path = merge_runs_ont(s.sample_id, srrs_to_fetch, Path(tmp), outdir, threads)
+                path = merge_runs_ont(s.sample_id, srrs_to_fetch, Path(tmp), outdir, pigz_threads, fqd_threads)
                 s.ont_reads = str(path) if path else ""
+                has_ont = path is not None
                 s.note += "ONT fetched; "
         else:
             s.note += "ONT SRRs not found; "
 
-    if s.illumina_r1 and Path(s.illumina_r1).exists():
+    if has_illumina:
         s.note += "Kept existing Illumina path."
     elif s.platform in ['illumina', 'hybrid']:
-        srrs_to_fetch = [x.strip() for x in s.srrs.split(',') if x.strip()] or resolve_srrs(s.biosample, 'illumina')
+        srrs_to_fetch = explicit_srrs or resolve_srrs(s.biosample, 'illumina')
         if srrs_to_fetch:
             eprint(f"[{s.sample_id}] Fetching Illumina reads for SRRs: {srrs_to_fetch}")
             with tempfile.TemporaryDirectory(prefix=f"{s.sample_id}_ill_") as tmp:
-                r1, r2 = merge_runs_illumina(s.sample_id, srrs_to_fetch, Path(tmp), outdir, threads)
+                r1, r2 = merge_runs_illumina(s.sample_id, srrs_to_fetch, Path(tmp), outdir, pigz_threads, fqd_threads)
                 s.illumina_r1 = str(r1) if r1 else ""
                 s.illumina_r2 = str(r2) if r2 else ""
+                has_illumina = r1 is not None
                 s.note += "Illumina fetched; "
         else:
             s.note += "Illumina SRRs not found; "
 
     # Final platform resolution based on what files actually exist
-    has_ont = bool(s.ont_reads and Path(s.ont_reads).exists())
-    has_illumina = bool(s.illumina_r1 and Path(s.illumina_r1).exists())
-
     if has_ont and has_illumina:
         s.platform = "hybrid"
     elif has_ont:
@@ -190,20 +325,41 @@ def main():
     ap.add_argument("--samples", required=True, help="Input TSV (config/samples.tsv)")
     ap.add_argument("--out", required=True, help="Output TSV (config/samples.resolved.tsv)")
     ap.add_argument("--outdir", default="data/raw", help="Directory for output FASTQs")
-    ap.add_argument("--threads", type=int, default=4, help="Threads for fasterq-dump")
+    ap.add_argument("--threads", type=int, default=4, help="Total thread budget, split between parallel samples and, within a sample, between fasterq-dump and pigz (each gets at least 1)")
+    ap.add_argument("--fqd-threads", type=int, default=6, help="Upper limit on fasterq-dump threads per sample; it does not speed up beyond ~6")
+    ap.add_argument("--parallel", type=int, default=1, help="Number of samples to fetch concurrently")
     args = ap.parse_args()
 
-    # Check for required tools
-    if not fasterq_dump_available():
-        eprint("ERROR: 'fasterq-dump' not found in PATH. Please install SRA-Tools.")
-        sys.exit(1)
-
     samples_tsv = Path(args.samples)
     if not samples_tsv.exists():
         eprint(f"Input TSV missing: {samples_tsv}"); sys.exit(1)
 
     initial_rows = read_tsv(samples_tsv)
-    final_rows = [process_sample(s, Path(args.outdir), args.threads) for s in initial_rows]
+    # On reruns every sample usually has its reads already; then neither SRA-Tools nor ENA is needed
+    to_fetch = [s for s in initial_rows if needs_fetch(s)]
+    if to_fetch:
+        # Check for required tools
+        if not fasterq_dump_available():
+            eprint("ERROR: 'fasterq-dump' not found in PATH. Please install SRA-Tools.")
+            sys.exit(1)
+        # Resolve every biosample without explicit SRRs in a few batched requests instead of one per sample
+        _ENA_CACHE.update(ena_query_runs_bulk([s.biosample for s in to_fetch if s.biosample and not s.srrs]))
+    outdir = Path(args.outdir)
+    # Created once here, before the pool starts, rather than by every merge; the merge helpers
+    # write only into outdir or the sample's own temporary directory
+    if to_fetch: os.makedirs(outdir, exist_ok=True)
+    parallel = max(1, args.parallel)
+    threads_per_sample = max(1, args.threads // parallel)
+    # fasterq-dump and pigz run at the same time within a sample (ONT streams one into the other, Illumina
+    # compresses a run while dumping the next), so they split the sample's share instead of each taking it.
+    # fasterq-dump stops scaling at 6-8 threads and can stall parallel filesystems beyond that, so it is
+    # also capped by --fqd-threads and spare cores are better spent on more samples (--parallel).
+    # With a share of 1 both still get one thread, so a sample never uses more than max(2, share).
+    fqd_threads = max(1, min(args.fqd_threads, threads_per_sample // 2))
+    pigz_threads = max(1, threads_per_sample - fqd_threads)
+    # Fetching is network/disk bound, so threads are enough to overlap downloads; map() keeps the input order
+    with ThreadPoolExecutor(max_workers=parallel) as ex:
+        final_rows = list(ex.map(lambda s: process_sample(s, outdir, pigz_threads, fqd_threads), initial_rows))
     write_tsv(Path(args.out), final_rows)
     eprint(f"Wrote resolved TSV to: {args.out}")
 
@@ -4,15 +4,20 @@ from typing import List, Dict, Iterable
 
 def read_tsv_by_header(path: str) -> List[Dict[str, str]]:
     with open(path, "r", encoding="utf-8", newline="") as fh:
-        reader = csv.DictReader(fh, delimiter="\t")
+        reader = csv.reader(fh, delimiter="\t")
+        # Strip the header once rather than re-stripping every key of every row
+        header = [h.strip() for h in next(reader, [])]
         rows = []
         for row in reader:
-            rows.append({(k or "").strip(): (v or "").strip() for k, v in row.items()})
+            if not row:
+                continue
+            values = [v.strip() for v in row[:len(header)]]
+            values += [""] * (len(header) - len(values))
+            rows.append(dict(zip(header, values)))
         return rows
 
 def write_tsv(path: str, rows: Iterable[Dict[str, str]], field_order: List[str]):
     with open(path, "w", encoding="utf-8", newline="") as fh:
-        w = csv.DictWriter(fh, fieldnames=field_order, delimiter="\t")
+        w = csv.DictWriter(fh, fieldnames=field_order, delimiter="\t", restval="", extrasaction="ignore")
         w.writeheader()
-        for r in rows:
-            w.writerow({k: r.get(k, "") for k in field_order})
\ No newline at end of file
+        w.writerows(rows)
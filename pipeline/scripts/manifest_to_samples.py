@@ -10,7 +10,8 @@ import csv
 import glob
 import os
 import sys
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator
 
 # --- DATA CONTRACT ---
 # These are the official column headers we will use everywhere.
@@ -19,21 +20,26 @@ OUTPUT_HEADERS = [
     "biosample", "srrs", "barcode"
 ]
 
+# Manifest columns that feed the Data Contract; everything else in a run manifest is ignored.
+MANIFEST_COLUMNS = (
+    "sample_id", "platform",
+    "read_path", "fastq_path", "fastq_guess",
+    "read_path_r1", "fastq_r1", "r1",
+    "read_path_r2", "fastq_r2", "r2",
+    "biosample_accession", "biosample",
+    "srr_accession", "srrs",
+    "barcode_id", "barcode",
+)
+
 def sniff_reader(fh):
-    # (Sniffer logic remains the same as in the previous version)
-    sample = fh.read(4096)
+    # Manifests are TSV by contract. Only a header line without tabs falls back to ',' or ';',
+    # which is cheaper and more predictable than csv.Sniffer guessing from a 4 KiB sample.
+    first = fh.readline()
     fh.seek(0)
-    try:
-        dialect = csv.Sniffer().sniff(sample, delimiters="\t,;")
-    except Exception:
-        class _Tab(csv.Dialect):
-            delimiter = "\t"
-            quotechar = '"'
-            doublequote = True
-            lineterminator = "\n"
-            quoting = csv.QUOTE_MINIMAL
-        dialect = _Tab
-    return csv.DictReader(fh, dialect=dialect)
+    delimiter = next((d for d in "\t,;" if d in first), "\t")
+    # Drop blank and tab-only lines (e.g. trailing rows from spreadsheet exports)
+    # before the csv module builds a row dict for them.
+    return csv.DictReader((line for line in fh if line.strip()), delimiter=delimiter)
 
 def normalize_platform(p: str, default_platform: str) -> str:
     # (Normalization logic remains the same)
@@ -46,17 +52,19 @@ def normalize_platform(p: str, default_platform: str) -> str:
         return p
     return default_platform
 
-def read_manifest(path: str) -> List[Dict[str, str]]:
-    # (Reading logic remains the same)
+def read_manifest(path: str) -> Iterator[Dict[str, str]]:
+    # Rows are yielded one at a time and reduced to MANIFEST_COLUMNS, so wide manifests
+    # are never copied in full. Every yielded row has a sample_id.
     with open(path, "r", newline="", encoding="utf-8") as fh:
         reader = sniff_reader(fh)
-        rows = []
+        if reader.fieldnames is None:
+            return
+        reader.fieldnames = [(k or "").strip() for k in reader.fieldnames]
         for row in reader:
-            norm = { (k or "").strip(): (v or "").strip() for k, v in row.items() }
-            if not any(norm.values()):
+            # Rows without a sample_id are unusable; reject them before normalizing anything else
+            if not (row.get("sample_id") or "").strip():
                 continue
-            rows.append(norm)
-        return rows
+            yield {k: (row.get(k) or "").strip() for k in MANIFEST_COLUMNS}
 
 def main():
     ap = argparse.ArgumentParser(description="Convert run manifests to the workflow's samples.tsv format.")
@@ -70,42 +78,36 @@ def main():
         print(f"No manifests matched: {args.manifests_glob}", file=sys.stderr)
         return 1
 
-    collected: List[Dict[str, str]] = []
-    for p in paths:
+    # Deduplicate by sample_id as rows arrive, keeping the first occurrence (dicts keep insertion order)
+    deduped: Dict[str, Dict[str, str]] = {}
+    # Reading is I/O-bound, so threads overlap the per-file open/sniff/parse; each worker drains
+    # its generator, and results are consumed in path order so the output stays deterministic
+    with ThreadPoolExecutor(max_workers=min(16, len(paths))) as ex:
+        futures = [ex.submit(lambda p: list(read_manifest(p)), p) for p in paths]
+    for p, fut in zip(paths, futures):
         try:
-            rows = read_manifest(p)
+            for r in fut.result():
+                sid = r["sample_id"]
+                if sid in deduped:
+                    continue
+
+                # This script only handles initial creation, so platform is ont or illumina, not hybrid.
+                plat = normalize_platform(r["platform"], args.default_platform)
+
+                # --- CHANGED: Map manifest columns to Data Contract columns ---
+                deduped[sid] = {
+                    "sample_id": sid,
+                    "platform": plat,
+                    "ont_reads": (r["read_path"] or r["fastq_path"] or r["fastq_guess"]) if plat == "ont" else "",
+                    "illumina_r1": (r["read_path_r1"] or r["fastq_r1"] or r["r1"]) if plat == "illumina" else "",
+                    "illumina_r2": (r["read_path_r2"] or r["fastq_r2"] or r["r2"]) if plat == "illumina" else "",
+                    "biosample": r["biosample_accession"] or r["biosample"],
+                    "srrs": r["srr_accession"] or r["srrs"],
+                    "barcode": r["barcode_id"] or r["barcode"],
+                }
         except Exception as e:
             print(f"Error reading {p}: {e}", file=sys.stderr)
             return 1
-        for r in rows:
-            sid = (r.get("sample_id") or "").strip()
-            if not sid:
-                continue
-
-            # This script only handles initial creation, so platform is ont or illumina, not hybrid.
-            plat = normalize_platform(r.get("platform", ""), args.default_platform)
-
-            # --- CHANGED: Map manifest columns to Data Contract columns ---
-            out_row = {
-                "sample_id": sid,
-                "platform": plat,
-                "ont_reads": (r.get("read_path") or r.get("fastq_path") or r.get("fastq_guess") or "") if plat == "ont" else "",
-                "illumina_r1": (r.get("read_path_r1") or r.get("fastq_r1") or r.get("r1") or "") if plat == "illumina" else "",
-                "illumina_r2": (r.get("read_path_r2") or r.get("fastq_r2") or r.get("r2") or "") if plat == "illumina" else "",
-                "biosample": (r.get("biosample_accession") or r.get("biosample") or "").strip(),
-                "srrs": (r.get("srr_accession") or r.get("srrs") or "").strip(),
-                "barcode": (r.get("barcode_id") or r.get("barcode") or "").strip(),
-            }
-            collected.append(out_row)
-
-    # Deduplicate by sample_id, keeping first occurrence
-    seen = set()
-    deduped: List[Dict[str, str]] = []
-    for r in collected:
-        if r["sample_id"] in seen:
-            continue
-        seen.add(r["sample_id"])
-        deduped.append(r)
 
     if not deduped:
         print("No valid sample rows found.", file=sys.stderr)
@@ -116,7 +118,7 @@ def main():
     with open(args.out, "w", newline="", encoding="utf-8") as outfh:
         writer = csv.DictWriter(outfh, fieldnames=OUTPUT_HEADERS, delimiter="\t", extrasaction='ignore')
         writer.writeheader()
-        writer.writerows(deduped)
+        writer.writerows(deduped.values())
 
     print(f"Wrote {args.out} with {len(deduped)} samples.", file=sys.stderr)
     return 0